@@ -7,7 +7,15 @@ import yaml
 import os
 from dotenv import load_dotenv
 from utils import login_request, logout_request
-import plotly.io as pio
+
+# Use the libyaml-backed loader when PyYAML was built with it
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Parse the YAML file once and share it across reruns and sessions
+@st.cache_resource
+def read_config(config_path):
+    with open(config_path, 'r') as file:
+        return yaml.load(file, Loader=YAML_LOADER)
 
 def load_config():
     # Determine the absolute path to config.yaml based on the current file's directory
@@ -15,8 +23,7 @@ def load_config():
     config = {}
 
     try:
-        with open(config_path, 'r') as file:
-            config = yaml.safe_load(file)
+        config = read_config(config_path)
     except FileNotFoundError:
         st.error(f"Configuration file not found at {config_path}.")
     except yaml.YAMLError:
@@ -24,13 +31,14 @@ def load_config():
     
     return config
 
-# color scheme
-BLACK_WHITE_GRAY_SCHEME = ['#000000', '#555555', '#808080', '#A9A9A9', '#D3D3D3', '#FFFFFF']
-
-# Set the custom Plotly template globally
-pio.templates["black_white_gray_template"] = pio.templates["plotly"]
-pio.templates["black_white_gray_template"]['layout']['colorway'] = BLACK_WHITE_GRAY_SCHEME
-pio.templates.default = "black_white_gray_template"
+# Read .env once and share the resolved values across reruns and sessions
+@st.cache_resource
+def load_environment():
+    load_dotenv()
+    return {
+        "USERNAME_RT": os.getenv("USERNAME_RT") or "",
+        "BASE_URL": os.getenv("BASE_URL") or ""
+    }
 
 def login():
     st.title("Login")
@@ -67,15 +75,11 @@ def main():
     st.set_page_config(layout="wide", page_icon="assets/NOI_OPENDATAHUB_NEW_BK_nospace-01.svg")
 
     # Load environment variables and config file
-    load_dotenv()
+    env = load_environment()
     st.session_state.config = load_config()  # Store config in session state
-    
-    # Other setup as before
-    username_env = os.getenv("USERNAME_RT")
-    base_url = os.getenv("BASE_URL")
 
-    st.session_state.username = username_env if username_env else ""
-    st.session_state.base_url = base_url if base_url else ""
+    st.session_state.username = env["USERNAME_RT"]
+    st.session_state.base_url = env["BASE_URL"]
     
     if "logged_in" not in st.session_state:
         st.session_state.logged_in = False
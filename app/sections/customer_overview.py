@@ -3,29 +3,62 @@
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-from collections import defaultdict
 import datetime
-from utils import fetch_data
+from utils import fetch_cached, fetch_years_parallel, apply_plotly_template, FETCH_CACHE_TTL
 
 
 # Data processing functions
 def process_companies_data(df, company_field="CF.{Company name}"):
-    companies = defaultdict(int)
-    for company in df[company_field].dropna():
-        companies[company] += 1
-    return companies
+    # A year whose tickets all have a blank company name has no such column
+    return df.reindex(columns=[company_field])[company_field].dropna().value_counts()
+
+def prepare_companies_table(companies):
+    return companies.rename_axis("Company").reset_index(name="Tickets")
 
 def prepare_top_companies(companies, top_n):
-    return pd.DataFrame(
-        sorted(companies.items(), key=lambda x: x[1], reverse=True)[:top_n],
-        columns=["Company", "Tickets"]
-    )
+    return prepare_companies_table(companies.nlargest(top_n))
+
+# Cache data fetch operation to avoid redundant requests
+@st.cache_data(ttl=FETCH_CACHE_TTL, show_spinner=False)
+def fetch_companies_for_year(year, query_params):
+    df = fetch_cached(year, query_params['query'], query_params['fields'])
+    return process_companies_data(df)
+
+# Render the per-year columns as a fragment so moving the slider doesn't rerun the data fetch
+@st.fragment
+def display_year_columns(all_companies, selected_years, max_companies):
+    # User input for number of top companies to display
+    top_n = st.slider("Number of top companies to display", 1, max_companies, 3)
+
+    # Display data for each selected year
+    data_columns = st.columns(len(selected_years))
+    for idx, year in enumerate(selected_years):
+        with data_columns[idx]:
+            companies = all_companies[year]
+            total_tickets = int(companies.sum())
+            total_companies = companies.size
+
+            # Emit the heading and totals as a single element
+            st.markdown(f"### {year}\n\nTickets: **{total_tickets}**\n\nCompanies: **{total_companies}**")
+
+            df_top = prepare_top_companies(companies, top_n)
+
+            # Create a pie chart using Plotly
+            fig = px.pie(df_top, values='Tickets', names='Company', title=f'Top {top_n} Companies in {year}')
+            st.plotly_chart(fig)
+
+            st.subheader("Top Companies")
+            st.table(df_top)
+
+            st.subheader("All Companies")
+            st.table(prepare_companies_table(companies.sort_index()))
 
 # Load the configuration
 config = st.session_state.config
 
+apply_plotly_template()
+
 st.title("Customer Overview")
 
 # Text of this Page
@@ -42,38 +75,10 @@ selected_years.sort()
 # Fetch and process data for each selected year
 all_companies = {}
 max_companies = 1
-for year in selected_years:
-    df = fetch_data(year, config['customers_overview']['query_parameters']['query'], config['customers_overview']['query_parameters']['fields'])
-    companies = process_companies_data(df)
+year_companies = fetch_years_parallel(fetch_companies_for_year, selected_years, config['customers_overview']['query_parameters'])
+for year, companies in zip(selected_years, year_companies):
     all_companies[year] = companies
     max_companies = max(max_companies, len(companies))
 
-# User input for number of top companies to display
-top_n = st.slider("Number of top companies to display", 1, max_companies, 3)
-
-# Display data for each selected year
-data_columns = st.columns(len(selected_years))
-for idx, year in enumerate(selected_years):
-    with data_columns[idx]:
-        st.subheader(f"{year}")
-
-        companies = all_companies[year]
-        total_tickets = sum(companies.values())
-        total_companies = len(companies)
-
-        st.write(f"Tickets: **{total_tickets}**")
-        st.write(f"Companies: **{total_companies}**")
-
-        df_top = prepare_top_companies(companies, top_n)
-
-        # Create a pie chart using Plotly
-        fig = px.pie(df_top, values='Tickets', names='Company', title=f'Top {top_n} Companies in {year}')
-        st.plotly_chart(fig)
-
-        st.subheader("Top Companies")
-        st.table(df_top)
-
-        st.subheader("All Companies")
-        st.table(pd.DataFrame(list(companies.items()), columns=["Company", "Tickets"]).sort_values(by="Company"))
-
-
+# Display the top companies slider and the per-year columns
+display_year_columns(all_companies, selected_years, max_companies)
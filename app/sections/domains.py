@@ -7,11 +7,12 @@ import streamlit as st
 import pandas as pd
 import datetime
 import plotly.express as px
-from utils import fetch_data
+from utils import fetch_cached, fetch_years_parallel, apply_plotly_template, FETCH_CACHE_TTL, FIGURE_CACHE_ENTRIES
 
 # Constants
 DEFAULT_START_YEAR = 2019
 DATE_FORMAT = '%a %b %d %H:%M:%S %Y'
+DOMAIN_FIELD = 'CF.{OpenDataHub Domain}'
 
 
 # Function to standardize domain field by sorting its components
@@ -22,24 +23,37 @@ def standardize_domain(domain):
     domain_parts.sort()  # Sort domain components alphabetically
     return ','.join(domain_parts)
 
+# Function to standardize a domain column, sorting each distinct value only once
+def standardize_domain_column(domains):
+    codes, uniques = pd.factorize(domains.fillna("Unknown Domain").astype(str))
+    standardized = pd.Index([standardize_domain(domain) for domain in uniques])
+    return pd.Series(standardized.take(codes), index=domains.index)
+
+# Cache data fetch operation to avoid redundant requests
+@st.cache_data(ttl=FETCH_CACHE_TTL, show_spinner=False)
+def fetch_year_data(year, query_params):
+    df = fetch_cached(year, query_params['query'], query_params['fields'])
+    # Only the domain column is used, keep the cached and concatenated frames small.
+    # Reindexing keeps every ticket: without a domain column they become NaN and count as "Unknown Domain".
+    return df.reindex(columns=[DOMAIN_FIELD])
+
 # Function to fetch and concatenate data for selected years
 def fetch_data_for_years(selected_years, query_params):
-    all_data = pd.DataFrame()  # Initialize an empty DataFrame to collect data from all selected years
-    for year in selected_years:
-        df = fetch_data(year, query_params['query'], query_params['fields'])
+    frames = []  # Collect the non-empty yearly frames and concatenate them once
+    yearly_data = fetch_years_parallel(fetch_year_data, selected_years, query_params)
+    for year, df in zip(selected_years, yearly_data):
         if not df.empty:
             df['Year'] = year  # Add the year column to the data
-            all_data = pd.concat([all_data, df], ignore_index=True)
-    return all_data
-
-# Function to process domain counts and calculate percentages
-def calculate_domain_percentage(data, year):
-    year_data = data[data['Year'] == year]
-    domain_counts = year_data['Standardized_Domain'].value_counts().reset_index()
-    domain_counts.columns = ['Domain', 'Count']
-    total_tickets = domain_counts['Count'].sum()
+            frames.append(df)
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+# Function to process domain counts and calculate percentages for all years in one pass
+def calculate_domain_percentages(data):
+    domain_counts = data.groupby(['Year', 'Standardized_Domain']).size().astype('int32').reset_index(name='Count')
+    domain_counts.columns = ['Year', 'Domain', 'Count']
+    total_tickets = domain_counts.groupby('Year')['Count'].transform('sum')
     domain_counts['Percentage'] = (domain_counts['Count'] / total_tickets) * 100
-    return domain_counts.sort_values(by='Domain')
+    return domain_counts
 
 # Function to create total bar chart of ticket counts per domain
 def create_total_domain_chart(data):
@@ -55,7 +69,8 @@ def create_total_domain_chart(data):
     )
     return fig
 
-# Function to create year-specific percentage bar chart
+# Function to create year-specific percentage bar chart, cached on the small per-year counts
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
 def create_yearly_percentage_chart(domain_counts, year, max_percentage):
     fig = px.bar(
         domain_counts, 
@@ -75,6 +90,8 @@ def create_yearly_percentage_chart(domain_counts, year, max_percentage):
 # Load configuration
 config = st.session_state.config
 
+apply_plotly_template()
+
 # Streamlit UI
 st.title("Domains Overview")
 
@@ -98,7 +115,7 @@ if selected_years:
     all_data = fetch_data_for_years(selected_years, query_params)
 
     if not all_data.empty:
-        all_data['Standardized_Domain'] = all_data['CF.{OpenDataHub Domain}'].apply(standardize_domain)
+        all_data['Standardized_Domain'] = standardize_domain_column(all_data[DOMAIN_FIELD])
 
         # Display total domain chart
         st.plotly_chart(create_total_domain_chart(all_data))
@@ -106,16 +123,20 @@ if selected_years:
         # Prepare columns for year-specific charts
         cols = st.columns(len(selected_years))
 
-        # Calculate the global max percentage for uniform y-axis range
-        max_percentage = max(
-            calculate_domain_percentage(all_data, year)['Percentage'].max() for year in selected_years
-        )
+        # Calculate the domain percentages of every year and the global max for uniform y-axis range
+        domain_percentages = calculate_domain_percentages(all_data)
+        max_percentage = domain_percentages['Percentage'].max()
+
+        # Partition the percentages by year once instead of filtering per chart
+        year_groups = {year: group.drop(columns='Year') for year, group in domain_percentages.groupby('Year')}
+        empty_year = domain_percentages.iloc[0:0].drop(columns='Year')
 
         # Display yearly charts
         for idx, year in enumerate(selected_years):
-            domain_counts_year = calculate_domain_percentage(all_data, year)
+            domain_counts_year = year_groups.get(year, empty_year)
             fig_year = create_yearly_percentage_chart(domain_counts_year, year, max_percentage)
-            cols[idx].plotly_chart(fig_year)
+            # Hide the mode bar on the side-by-side yearly charts, hover still shows each bar's domain and percentage
+            cols[idx].plotly_chart(fig_year, config={'displayModeBar': False})
 
     else:
         st.write("No data available for the selected years.")
@@ -7,36 +7,40 @@ import pandas as pd
 import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import fetch_data
+from utils import fetch_cached, fetch_years_parallel, prepare_month_pivot, apply_plotly_template, FETCH_CACHE_TTL
 
-def load_data(selected_years):
-    # Initialize a list to hold the monthly ticket counts for each year
-    monthly_ticket_data = []
-    yearly_ticket_counts = []
-
-    for year in selected_years:
-        # Fetch data for the year
-        df = fetch_data(year, config['help_overview']['query_parameters']['query'], config['help_overview']['query_parameters']['fields'])
-        
+# Cache data fetch operation to avoid redundant requests
+@st.cache_data(ttl=FETCH_CACHE_TTL, show_spinner=False)
+def fetch_year_data(year, query_params):
+    df = fetch_cached(year, query_params['query'], query_params['fields'])
+    if not df.empty:
         # Ensure the "Created" column is in datetime format
         df['Created'] = pd.to_datetime(df['Created'], format='%a %b %d %H:%M:%S %Y')
-        
-        # Extract month and year from the "Created" column
-        df['Year'] = df['Created'].dt.year
-        df['Month'] = df['Created'].dt.month
-        
-        # Group by Year and Month, then count the number of tickets
-        monthly_counts = df.groupby(['Year', 'Month']).size().reset_index(name='Ticket Count')
-        yearly_count = df['Year'].value_counts().reset_index(name='Ticket Count')
-        yearly_count.columns = ['Year', 'Ticket Count']
-        
-        # Append to the list
-        monthly_ticket_data.append(monthly_counts)
-        yearly_ticket_counts.append(yearly_count)
-    
-    # Concatenate all years' data into a single DataFrame
-    combined_monthly_df = pd.concat(monthly_ticket_data, ignore_index=True)
-    combined_yearly_df = pd.concat(yearly_ticket_counts, ignore_index=True).groupby('Year').sum().reset_index()
+        # Only the creation date is used, keep the cached frames small
+        df = df[['Created']]
+    return df
+
+def load_data(selected_years):
+    # Fetch the data of all years concurrently
+    yearly_data = fetch_years_parallel(fetch_year_data, selected_years, config['help_overview']['query_parameters'])
+    frames = [df for df in yearly_data if not df.empty]
+
+    if not frames:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Combine the years so the counts are computed in a single pass
+    df = pd.concat(frames, ignore_index=True)
+
+    # Extract month and year from the "Created" column
+    df['Year'] = df['Created'].dt.year.astype('int16')
+    df['Month'] = df['Created'].dt.month.astype('int8')
+
+    # Group by Year and Month, then count the number of tickets. The groups come out in first-seen order;
+    # the month/year order is fixed downstream by prepare_month_pivot and the sorted yearly groupby
+    combined_monthly_df = df.groupby(['Year', 'Month'], sort=False).size().astype('int32').reset_index(name='Ticket Count')
+
+    # The yearly totals are the sum of the monthly counts
+    combined_yearly_df = combined_monthly_df.groupby('Year', as_index=False)['Ticket Count'].sum()
     
     return combined_monthly_df, combined_yearly_df
 
@@ -44,14 +48,8 @@ def plot_monthly_tickets(data, selected_years):
     """Displays a bar chart of the number of tickets created per month for each selected year."""
     st.subheader("Number of Tickets Created Per Month Per Year")
 
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    month_map = {i+1: month for i, month in enumerate(month_order)}
-
     # Create a pivot table to organize data
-    pivot_table = data.pivot(index='Month', columns='Year', values='Ticket Count').fillna(0)
-    pivot_table.index = pivot_table.index.map(month_map)
-    pivot_table.index = pd.CategoricalIndex(pivot_table.index, categories=month_order, ordered=True)
-    pivot_table = pivot_table.sort_index()
+    pivot_table = prepare_month_pivot(data)
 
     # Convert the pivot table to Plotly-friendly format and plot using Plotly Express
     fig = px.bar(
@@ -85,14 +83,8 @@ def display_heatmap_table(data):
     """Displays a heatmap-like table of monthly ticket counts per year using a black-and-white color scheme."""
     st.subheader("Heatmap of Monthly Ticket Counts Per Year")
 
-    month_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    month_map = {i+1: month for i, month in enumerate(month_order)}
-
     # Create a pivot table to organize data
-    heatmap_data = data.pivot_table(index='Month', columns='Year', values='Ticket Count', aggfunc='sum', fill_value=0)
-    heatmap_data.index = heatmap_data.index.map(month_map)
-    heatmap_data.index = pd.CategoricalIndex(heatmap_data.index, categories=month_order, ordered=True)
-    heatmap_data = heatmap_data.sort_index()
+    heatmap_data = prepare_month_pivot(data)
 
     # Use the black-and-white 'Greys' color scale for the heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -114,6 +106,8 @@ def display_heatmap_table(data):
 # Load the configuration
 config = st.session_state.config
 
+apply_plotly_template()
+
 st.title("Help Queue Overview")
 
 # Text of this Page
@@ -128,13 +122,19 @@ selected_years = st.multiselect(
 selected_years.sort()
 
 # Load the data
-combined_monthly_df, combined_yearly_df = load_data(selected_years)
-
-# Plot the monthly data
-plot_monthly_tickets(combined_monthly_df, selected_years)
-
-# Display the heatmap-like table using black-and-white color scheme
-display_heatmap_table(combined_monthly_df)
-
-# Plot the yearly trend
-plot_yearly_trend(combined_yearly_df)
+if selected_years:
+    combined_monthly_df, combined_yearly_df = load_data(selected_years)
+
+    if not combined_monthly_df.empty:
+        # Plot the monthly data
+        plot_monthly_tickets(combined_monthly_df, selected_years)
+
+        # Display the heatmap-like table using black-and-white color scheme
+        display_heatmap_table(combined_monthly_df)
+
+        # Plot the yearly trend
+        plot_yearly_trend(combined_yearly_df)
+    else:
+        st.write("No data available for the selected years.")
+else:
+    st.write("Please select at least one year.")
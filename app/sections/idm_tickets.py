@@ -8,65 +8,64 @@ import pandas as pd
 import datetime
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import fetch_data
+from utils import fetch_cached, fetch_years_parallel, prepare_month_pivot, apply_plotly_template, FETCH_CACHE_TTL
 
 # Constants
 DEFAULT_START_YEAR = 2019
 DATE_FORMAT = '%a %b %d %H:%M:%S %Y'
-MONTH_ORDER = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-MONTH_MAP = {i+1: month for i, month in enumerate(MONTH_ORDER)}
 
 # Fetch and process data for the selected years
 def fetch_and_process_data(selected_years, config):
-    monthly_ticket_data, owner_data_list, yearly_ticket_counts = [], [], []
-
-    for year in selected_years:
-        df = fetch_data_for_year(year, config)
-        if not df.empty:
-            df = process_year_data(df)
-            owner_data_list.append(df[['Owner']].copy())
-            monthly_ticket_data.append(calculate_monthly_ticket_counts(df))
-            yearly_ticket_counts.append(calculate_yearly_ticket_counts(df))
-    
+    yearly_data = fetch_years_parallel(fetch_data_for_year, selected_years, config['idm_tickets']['query_parameters'])
+    frames = [df for df in yearly_data if not df.empty]
+
+    if not frames:
+        return pd.DataFrame(), pd.DataFrame(), None
+
+    # Aggregate all years in one pass over the combined tickets
+    df = process_year_data(pd.concat(frames, ignore_index=True))
+    combined_monthly_df = calculate_monthly_ticket_counts(df)
+    owner_counts = df['Owner'].value_counts() if 'Owner' in df.columns else None
     return (
-        pd.concat(monthly_ticket_data, ignore_index=True),
-        pd.concat(yearly_ticket_counts, ignore_index=True).groupby('Year').sum().reset_index(),
-        pd.concat(owner_data_list, ignore_index=True)
+        combined_monthly_df,
+        calculate_yearly_ticket_counts(combined_monthly_df),
+        owner_counts
     )
 
-# Fetch data for a specific year
-def fetch_data_for_year(year, config):
-    query_params = config['idm_tickets']['query_parameters']
-    df = fetch_data(year, query_params['query'], query_params['fields'])
-    df['Created'] = pd.to_datetime(df['Created'], format=DATE_FORMAT)
+# Fetch data for a specific year, cached to avoid redundant requests
+@st.cache_data(ttl=FETCH_CACHE_TTL, show_spinner=False)
+def fetch_data_for_year(year, query_params):
+    df = fetch_cached(year, query_params['query'], query_params['fields'])
+    if not df.empty:
+        df['Created'] = pd.to_datetime(df['Created'], format=DATE_FORMAT)
+        # Only the creation date and owner are used, keep the cached frames small
+        df = df.filter(items=['Created', 'Owner'])
     return df
 
 # Process year data: add 'Year' and 'Month' columns
 def process_year_data(df):
-    df['Year'] = df['Created'].dt.year.astype(int)
-    df['Month'] = df['Created'].dt.month
+    df['Year'] = df['Created'].dt.year.astype('int16')
+    df['Month'] = df['Created'].dt.month.astype('int8')
     return df
 
-# Calculate monthly ticket counts
+# Calculate monthly ticket counts in first-seen group order; the month/year order is fixed downstream
+# by prepare_month_pivot and the sorted yearly groupby
 def calculate_monthly_ticket_counts(df):
-    monthly_counts = df.groupby(['Year', 'Month'], as_index=False).agg({'Created': 'size'})
-    monthly_counts.columns = ['Year', 'Month', 'Ticket Count']
-    return monthly_counts
+    monthly_counts = df.groupby(['Year', 'Month'], sort=False).size().astype('int32')
+    return monthly_counts.reset_index(name='Ticket Count')
 
-# Calculate yearly ticket counts
-def calculate_yearly_ticket_counts(df):
-    yearly_counts = df.groupby('Year', as_index=False).agg({'Created': 'size'})
-    yearly_counts.columns = ['Year', 'Ticket Count']
-    return yearly_counts
+# Calculate yearly ticket counts from the monthly counts
+def calculate_yearly_ticket_counts(monthly_counts):
+    return monthly_counts.groupby('Year', as_index=False)['Ticket Count'].sum()
 
 # Plot the distribution of ticket owners
-def plot_owner_distribution(df):
+def plot_owner_distribution(owner_counts):
     st.subheader("Owner Distribution")
-    if 'Owner' not in df.columns:
+    if owner_counts is None:
         st.error("The 'Owner' column is missing from the data.")
         return
 
-    owner_counts = df['Owner'].value_counts().reset_index()
+    owner_counts = owner_counts.reset_index()
     owner_counts.columns = ['Owner', 'Ticket Count']
     fig = px.pie(owner_counts, hole=0.4, values='Ticket Count', names='Owner', title='Ticket Distribution by Owner')
     st.plotly_chart(fig)
@@ -74,7 +73,7 @@ def plot_owner_distribution(df):
 # Plot the number of tickets created per month for each selected year
 def plot_monthly_tickets(data, selected_years):
     st.subheader("Number of Tickets Created Per Month Per Year")
-    pivot_table = prepare_monthly_pivot_table(data)
+    pivot_table = prepare_month_pivot(data)
     
     # Convert the pivot table to Plotly-friendly format and plot using Plotly Express
     fig = px.bar(
@@ -88,17 +87,9 @@ def plot_monthly_tickets(data, selected_years):
     
     st.plotly_chart(fig)
 
-# Prepare pivot table for monthly ticket data
-def prepare_monthly_pivot_table(data):
-    pivot_table = data.pivot(index='Month', columns='Year', values='Ticket Count').fillna(0)
-    pivot_table.index = pivot_table.index.map(MONTH_MAP)
-    pivot_table.index = pd.CategoricalIndex(pivot_table.index, categories=MONTH_ORDER, ordered=True)
-    return pivot_table.sort_index()
-
 # Plot the total number of tickets per year
 def plot_yearly_trend(data):
     st.subheader("Total Number of Tickets Per Year")
-    data['Year'] = data['Year'].astype(int)
     fig = px.bar(data, x='Ticket Count', y='Year', orientation='h', title="Total Tickets per Year")
     fig.update_layout(
         yaxis=dict(tickmode='linear', tick0=0, dtick=1)
@@ -109,13 +100,8 @@ def plot_yearly_trend(data):
 def display_heatmap_table(data, color_scheme='bw'):
     st.subheader("Heatmap of Monthly Ticket Counts Per Year")
     
-    heatmap_data = prepare_heatmap_data(data)
-    
-    year_columns = heatmap_data.columns.drop('Month')
-    heatmap_data[year_columns] = heatmap_data[year_columns].astype(int)
-
-    # Sort the year columns and ensure correct year ordering
-    heatmap_data = heatmap_data.set_index('Month').sort_index(axis=1)
+    # Integer counts with months in calendar order and the year columns already sorted
+    heatmap_data = prepare_month_pivot(data)
 
     # Define color scales
     colorscale = 'Greys'
@@ -141,19 +127,11 @@ def display_heatmap_table(data, color_scheme='bw'):
 
     st.plotly_chart(fig)
 
-
-
-
-# Prepare heatmap data
-def prepare_heatmap_data(data):
-    heatmap_data = data.pivot_table(index='Month', columns='Year', values='Ticket Count', aggfunc='sum', fill_value=0)
-    heatmap_data.index = heatmap_data.index.map(MONTH_MAP)
-    heatmap_data.index = pd.CategoricalIndex(heatmap_data.index, categories=MONTH_ORDER, ordered=True)
-    return heatmap_data.sort_index().reset_index()
-
 # Load configuration
 config = st.session_state.config
 
+apply_plotly_template()
+
 # Streamlit UI
 st.title("IDM Tickets Overview")
 
@@ -170,18 +148,21 @@ selected_years.sort()
 
 # Load and process the data
 if selected_years:
-    combined_monthly_df, combined_yearly_df, combined_owner_df = fetch_and_process_data(selected_years, config)
+    combined_monthly_df, combined_yearly_df, owner_counts = fetch_and_process_data(selected_years, config)
 
-    # Plot the owner distribution pie chart
-    plot_owner_distribution(combined_owner_df)
+    if not combined_monthly_df.empty:
+        # Plot the owner distribution pie chart
+        plot_owner_distribution(owner_counts)
 
-    # Plot the monthly ticket data
-    plot_monthly_tickets(combined_monthly_df, selected_years)
+        # Plot the monthly ticket data
+        plot_monthly_tickets(combined_monthly_df, selected_years)
 
-    # Display the heatmap-like table
-    display_heatmap_table(combined_monthly_df)
+        # Display the heatmap-like table
+        display_heatmap_table(combined_monthly_df)
 
-    # Plot the yearly trend
-    plot_yearly_trend(combined_yearly_df)
+        # Plot the yearly trend
+        plot_yearly_trend(combined_yearly_df)
+    else:
+        st.write("No data available for the selected years.")
 else:
     st.write("Please select at least one year.")
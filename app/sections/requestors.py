@@ -6,43 +6,51 @@
 import streamlit as st
 import pandas as pd
 import datetime
-import plotly.express as px
-from utils import fetch_data
+import plotly.graph_objects as go
+from utils import fetch_cached, fetch_years_parallel, apply_plotly_template, FETCH_CACHE_TTL, FIGURE_CACHE_ENTRIES
 
 # Constants
 DEFAULT_START_YEAR = 2019
+REQUESTOR_FIELDS = ['CF.{Type of requestor}', 'CF.{Requestor use case}', 'CF.{Company type}']
 
 # Cache data fetch operation to avoid redundant requests
-@st.cache_data
+@st.cache_data(ttl=FETCH_CACHE_TTL, show_spinner=False)
 def fetch_and_process_data(year, query_params):
-    return fetch_data(year, query_params['query'], query_params['fields'])
+    df = fetch_cached(year, query_params['query'], query_params['fields'])
+    # Only the charted fields are used, so view toggles only copy those out of the cache.
+    # Reindexing keeps a field that is blank on every ticket as a NaN column instead of dropping it.
+    return df.reindex(columns=REQUESTOR_FIELDS)
 
 # Function to create a bar chart for a categorical column
 def create_bar_chart(df, column_name, title):
     count_series = df[column_name].value_counts()
-    fig = px.bar(
-        x=count_series.index, 
-        y=count_series.values, 
-        labels={'x': column_name, 'y': 'Count'}, 
-        title=title
-    )
+    fig = go.Figure(go.Bar(x=count_series.index.tolist(), y=count_series.values.tolist()))
+    fig.update_layout(title=title, xaxis_title=column_name, yaxis_title='Count')
     return fig
 
+# Function to create a pie chart from precomputed counts, cached so view toggles reuse the figure
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def create_counts_pie_chart(count_series, title, hole_size=0.4):
+    fig = go.Figure(go.Pie(labels=count_series.index.tolist(), values=count_series.values.tolist(), hole=hole_size))
+    fig.update_layout(title=title)
+    return fig
+
+# Helper function to count the values of a column; pies order their slices themselves, so the counts stay unsorted
+def count_values(df, column_name):
+    return df.groupby(column_name, sort=False, observed=True).size()
+
 # Function to create a pie chart for a categorical column
 def create_pie_chart(df, column_name, title, hole_size=0.4):
-    count_series = df[column_name].value_counts()
-    fig = px.pie(
-        names=count_series.index, 
-        values=count_series.values, 
-        title=title,
-        hole=hole_size
-    )
-    return fig
+    return create_counts_pie_chart(count_values(df, column_name), title, hole_size)
 
-# Function to create a combined pie chart for multiple years
+# Function to create a combined pie chart for multiple years by summing the yearly counts
 def create_combined_pie_chart(all_data, column_name, title, hole_size=0.4):
-    combined_df = pd.concat(all_data, ignore_index=True)
-    return create_pie_chart(combined_df, column_name, title, hole_size)
+    yearly_counts = [count_values(df, column_name) for df in all_data if column_name in df.columns]
+    if yearly_counts:
+        count_series = pd.concat(yearly_counts).groupby(level=0).sum().sort_values(ascending=False)
+    else:
+        count_series = pd.Series(dtype='int64')
+    return create_counts_pie_chart(count_series, title, hole_size)
 
 # Streamlit UI to display data and charts
 def display_combined_view(all_data):
@@ -105,6 +113,8 @@ def display_yearly_view(all_data, selected_years):
 
 config = st.session_state.config
 
+apply_plotly_template()
+
 st.title("Requestors Overview")
 
 # Text of this Page
@@ -127,8 +137,8 @@ use_alternate_query = st.checkbox(config['requestors']['markdown_text']['text_bu
 query_params_key = 'query_parameters_2' if use_alternate_query else 'query_parameters_1'
 query_params = config['requestors'][query_params_key]
 
-# Fetch data for each selected year
-all_data = [fetch_and_process_data(year, query_params) for year in selected_years]
+# Fetch data for all selected years concurrently
+all_data = fetch_years_parallel(fetch_and_process_data, selected_years, query_params)
 
 # Toggle to switch between "Combined" and "Yearly" views
 view_switch = st.radio("Select View:", ["Combined View", "Yearly View"])
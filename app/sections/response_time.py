@@ -5,18 +5,25 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
 import datetime
-from utils import fetch_data
+from utils import fetch_cached, fetch_years_parallel, apply_plotly_template, FETCH_CACHE_TTL, FETCH_CACHE_ENTRIES, FIGURE_CACHE_ENTRIES
 
 # Constants for response time categories
 RESPONSE_CATEGORIES = ["Within first hour", "Within first day", "Within first 2 days", "Within first week", "More than a week", "Not set"]
 DATE_FORMAT = '%a %b %d %H:%M:%S %Y'
 HOURS_IN_A_DAY = 24
 HOURS_IN_A_WEEK = 7 * HOURS_IN_A_DAY
+# Upper bounds (inclusive) of the timed response categories, in hours
+RESPONSE_BOUNDS = np.array([1, HOURS_IN_A_DAY, 2 * HOURS_IN_A_DAY, HOURS_IN_A_WEEK], dtype=np.float64)
 
 # Data processing function to calculate response time categories
 def categorize_response_times(df, started_field="Started", created_field="Created"):
+    # A field that is blank on every ticket has no column, its tickets count as "Not set"
+    df = df.reindex(columns=df.columns.union([started_field, created_field], sort=False))
+
     # Parse datetime fields
     df[started_field] = pd.to_datetime(df[started_field], format=DATE_FORMAT, errors='coerce')
     df[created_field] = pd.to_datetime(df[created_field], format=DATE_FORMAT, errors='coerce')
@@ -25,30 +32,22 @@ def categorize_response_times(df, started_field="Started", created_field="Create
     df['ResponseTime'] = (df[started_field] - df[created_field]).dt.total_seconds() / 3600.0
 
     # Categorize based on response time
-    df['ResponseCategory'] = df['ResponseTime'].apply(lambda hours: categorize_time(hours))
-    df['ResponseCategory'] = pd.Categorical(df['ResponseCategory'], categories=RESPONSE_CATEGORIES, ordered=True)
+    df['ResponseCategory'] = categorize_times(df['ResponseTime'])
 
     return df
 
-# Helper function to categorize response time
-def categorize_time(hours):
-    if pd.isna(hours):
-        return "Not set"
-    elif hours <= 1:
-        return "Within first hour"
-    elif hours <= HOURS_IN_A_DAY:
-        return "Within first day"
-    elif hours <= 2 * HOURS_IN_A_DAY:
-        return "Within first 2 days"
-    elif hours <= HOURS_IN_A_WEEK:
-        return "Within first week"
-    else:
-        return "More than a week"
-
-# Cache data fetch operation to avoid redundant requests
-@st.cache_data
-def fetch_and_process_data(year, query_params):
-    df = fetch_data(year, query_params['query'], query_params['fields'])
+# Helper function to categorize response times: the index of the first bound not below the
+# response time is the category code, missing response times are "Not set"
+def categorize_times(hours):
+    hours = hours.to_numpy(dtype=np.float64)
+    codes = np.searchsorted(RESPONSE_BOUNDS, hours, side='left')
+    codes[np.isnan(hours)] = RESPONSE_CATEGORIES.index("Not set")
+    return pd.Categorical.from_codes(codes, categories=RESPONSE_CATEGORIES, ordered=True)
+
+# Cache data fetch operation to avoid redundant requests, keyed on the plain query strings
+@st.cache_data(ttl=FETCH_CACHE_TTL, max_entries=FETCH_CACHE_ENTRIES, show_spinner=False)
+def fetch_and_process_data(year, query, fields):
+    df = fetch_cached(year, query, fields)
     if not df.empty:
         df = categorize_response_times(df)
     return df
@@ -56,18 +55,13 @@ def fetch_and_process_data(year, query_params):
 # Helper function for creating a pie chart
 def create_pie_chart(df, year):
     response_counts = df['ResponseCategory'].value_counts().reindex(df['ResponseCategory'].cat.categories, fill_value=0)
-    fig = px.pie(
-        names=response_counts.index, 
-        values=response_counts.values, 
-        title=f"Response Time Distribution",
-        category_orders={'names': df['ResponseCategory'].cat.categories.tolist()},
-        hole=0.4
-    )
+    fig = go.Figure(go.Pie(labels=response_counts.index.tolist(), values=response_counts.values.tolist(), hole=0.4))
+    fig.update_layout(title="Response Time Distribution")
     return fig
 
-# Helper function for creating a stacked bar chart
-def create_stacked_bar_chart(stacked_data):
-    stacked_df = pd.DataFrame(stacked_data)
+# Helper function for creating a stacked bar chart, cached on the per-year percentages
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES, show_spinner=False)
+def create_stacked_bar_chart(stacked_df):
     melted_df = stacked_df.melt(id_vars='Year', var_name='Response Category', value_name='Percentage')
 
     # Filter categories for the bar chart
@@ -95,22 +89,21 @@ def create_stacked_bar_chart(stacked_data):
 
 # Prepare data for stacked bar chart
 def prepare_stacked_data(all_data):
-    stacked_data = [
-        {
-            "Year": year,
-            **{
-                category: (response_counts.get(category, 0) / total_responses) * 100
-                for category, total_responses in zip(RESPONSE_CATEGORIES, [response_counts.sum()] * len(RESPONSE_CATEGORIES))
-            }
-        }
-        for year, response_counts in all_data.items()
-    ]
-    return stacked_data
+    # One row of category counts per year (already in RESPONSE_CATEGORIES order), normalized by the row totals
+    years = list(all_data)
+    counts = np.vstack([all_data[year].to_numpy() for year in years])
+    percentages = counts / counts.sum(axis=1, keepdims=True) * 100
+
+    stacked_df = pd.DataFrame(percentages, columns=RESPONSE_CATEGORIES)
+    stacked_df.insert(0, 'Year', years)
+    return stacked_df
 
 
 # Load configuration
 config = st.session_state.config
 
+apply_plotly_template()
+
 st.title("Response Times")
 
 # Text of this Page
@@ -131,12 +124,12 @@ use_query_2 = st.checkbox(config['response_time']['markdown_text']['text_button'
 query_params_key = 'query_parameters_2' if use_query_2 else 'query_parameters_1'
 query_params = config['response_time'][query_params_key]
 
-# Fetch and display data
+# Fetch data for all selected years concurrently, then display it
+yearly_data = fetch_years_parallel(fetch_and_process_data, selected_years, query_params['query'], query_params['fields'])
 all_data = {}
 data_columns = st.columns(len(selected_years))
 
-for idx, year in enumerate(selected_years):
-    df = fetch_and_process_data(year, query_params)
+for idx, (year, df) in enumerate(zip(selected_years, yearly_data)):
     with data_columns[idx]:
         st.subheader(f"{year}")
         if df.empty:
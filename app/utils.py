@@ -2,45 +2,167 @@
 #
 # SPDX-License-Identifier: AGPL-3.0-or-later
 
+import datetime
+import logging
+import re
 import requests
 import streamlit as st
-import pandas as pd
+import threading
+from http.cookiejar import DefaultCookiePolicy
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for concurrent RT requests when fetching several years
+MAX_FETCH_WORKERS = 8
+
+# Seconds a cached RT query result for the current year is reused before it is fetched again
+CURRENT_YEAR_CACHE_TTL = 300
+
+# Seconds the pages keep their processed per-year frames. Not longer than the current year's TTL,
+# otherwise the page caches would hold the live year past it; past years come back from the disk cache.
+FETCH_CACHE_TTL = CURRENT_YEAR_CACHE_TTL
+
+# Part of the persisted past-year cache key. Bump it when fetch_data or parse_records change their output,
+# so results stored on disk by an older version are never served again.
+PAST_YEAR_CACHE_VERSION = 1
+
+# Number of cached RT query results kept per fetch function (years x query variants)
+FETCH_CACHE_ENTRIES = 64
+
+# Number of built figures kept per cached chart function
+FIGURE_CACHE_ENTRIES = 64
+
+# Connect and read timeouts in seconds for RT requests, so a stalled server can't hang a page forever
+REQUEST_TIMEOUT = (5, 120)
+
+# Shared session so consecutive RT requests reuse keep-alive connections.
+# It is shared by all users, so it must never store cookies: every request passes the user's own jar.
+session = requests.Session()
+session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+# One pooled connection per parallel fetch worker; only failed connects are retried, never a sent POST
+adapter = HTTPAdapter(pool_maxsize=MAX_FETCH_WORKERS, max_retries=Retry(total=2, read=0, backoff_factor=0.2))
+session.mount('https://', adapter)
+session.mount('http://', adapter)
+
+# RT separates the tickets of a search result with "--" lines, each field is a "key: value" line
+RECORD_SEPARATOR = re.compile(r'^[ \t\r]*--[ \t\r]*$', re.MULTILINE)
+FIELD_LINE = re.compile(r'^(.*?): (.*)$', re.MULTILINE)
+
+MONTH_ORDER = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# color scheme
+BLACK_WHITE_GRAY_SCHEME = ['#000000', '#555555', '#808080', '#A9A9A9', '#D3D3D3', '#FFFFFF']
+
+# Registering the template is process-wide, so do it only once instead of on every rerun
+@st.cache_resource
+def apply_plotly_template():
+    # Imported here so the login and logout pages don't have to load plotly
+    import plotly.io as pio
+
+    # Set the custom Plotly template globally
+    pio.templates["black_white_gray_template"] = pio.templates["plotly"]
+    pio.templates["black_white_gray_template"]['layout']['colorway'] = BLACK_WHITE_GRAY_SCHEME
+    pio.templates.default = "black_white_gray_template"
+
+def prepare_month_pivot(data, value_column='Ticket Count'):
+    # Months as rows in calendar order (months without tickets as 0), years as columns
+    pivot_table = data.groupby(['Month', 'Year'])[value_column].sum().unstack(fill_value=0)
+    # After the reindex the rows are exactly months 1..12, so the labels can be assigned positionally
+    return pivot_table.reindex(range(1, 13), fill_value=0).set_axis(MONTH_ORDER).rename_axis('Month')
 
 def fetch_data(year, query, fields):
-    # Construct the base URL and parameters
-    url = f"{st.session_state.base_url}search/ticket?user={st.session_state.username}&pass={st.session_state.password}&fields={fields}"
+    # Imported here so the login and logout pages don't have to load pandas
+    import pandas as pd
+
+    # Construct the search URL; the credentials and the query are sent as form fields so they stay out of the URL
+    url = f"{st.session_state.base_url}search/ticket"
     cookie_jar = st.session_state.cookie_jar
 
     # Add the Created condition to the query
     created_condition = f"( Created>'{year-1}-12-31'AND Created<'{year+1}-01-01' )"
     query = f"{query} AND {created_condition}"
-    
-    # Construct the final query URL
-    full_url = f"{url}&query={query}"
-    print(f"Querying URL: {full_url}")
+    logger.debug("Querying RT: %s", query)
     
     # Make the POST request
-    response = requests.post(full_url, cookies=cookie_jar)
-    print(response.text)
+    data = {
+        'user': st.session_state.username,
+        'pass': st.session_state.password,
+        'fields': fields,
+        'query': query
+    }
+    response = session.post(url, data=data, cookies=cookie_jar, timeout=REQUEST_TIMEOUT)
+
+    # RT reports errors such as "401 Credentials required" in the status line of a 200 response.
+    # Raise on those and on HTTP errors, so a failed query is never parsed and cached as a result.
+    response.raise_for_status()
+    status_line = response.text.lstrip().partition('\n')[0]
+    if "200 Ok" not in status_line:
+        raise requests.HTTPError(f"RT query failed: {status_line}", response=response)
     
     # Process the response text into a structured DataFrame
-    data = response.text.split('--')
-    records = []
-    for entry in data:
-        record = {}
-        for line in entry.strip().split("\n"):
-            if ": " in line:
-                key, value = line.split(": ", 1)
-                record[key.strip()] = value.strip()
-        if record:
-            records.append(record)
+    records = parse_records(response.text)
     
     # Convert records to a DataFrame
     df = pd.DataFrame(records)
-    print(df)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("RT returned %d rows, columns: %s", len(df), list(df.columns))
     return df
 
 
+# Tickets created in past years are settled, so their query results are persisted to disk and survive
+# restarts. Only successful queries get here, fetch_data raises on RT errors. Persisted caches can't
+# expire: the entries are dropped by bumping PAST_YEAR_CACHE_VERSION or with fetch_past_year_data.clear().
+@st.cache_data(persist="disk", max_entries=FETCH_CACHE_ENTRIES, show_spinner=False)
+def fetch_past_year_data(year, query, fields, cache_version):
+    return fetch_data(year, query, fields)
+
+# The current year is still changing, so it is only cached for a few minutes
+@st.cache_data(ttl=CURRENT_YEAR_CACHE_TTL, max_entries=FETCH_CACHE_ENTRIES, show_spinner=False)
+def fetch_current_year_data(year, query, fields):
+    return fetch_data(year, query, fields)
+
+def fetch_cached(year, query, fields):
+    if year < datetime.date.today().year:
+        return fetch_past_year_data(year, query, fields, PAST_YEAR_CACHE_VERSION)
+    return fetch_current_year_data(year, query, fields)
+
+
+def parse_records(text):
+    """Parses an RT search result body into one dict per ticket.
+
+    Fields without a value, also on a ticket's last line, are left out so they become missing
+    values in the DataFrame instead of empty strings:
+
+    >>> parse_records("RT/4.4.3 200 Ok\\n\\nid: ticket/1\\nCF.{Customer}: \\n--\\nid: ticket/2\\nCF.{Customer}: ACME\\n")
+    [{'id': 'ticket/1'}, {'id': 'ticket/2', 'CF.{Customer}': 'ACME'}]
+    """
+    # Each ticket's "key: value" lines are matched in one regex pass instead of splitting line by line
+    records = []
+    for entry in RECORD_SEPARATOR.split(text):
+        record = {key.strip(): value for key, raw_value in FIELD_LINE.findall(entry) if (value := raw_value.strip())}
+        if record:
+            records.append(record)
+    return records
+
+def fetch_years_parallel(fetch, years, *args):
+    # The per-year RT queries are independent, so run them concurrently.
+    # Worker threads get the caller's script context so they can read st.session_state.
+    ctx = get_script_run_ctx()
+    workers = min(MAX_FETCH_WORKERS, max(len(years), 1))
+    try:
+        with ThreadPoolExecutor(max_workers=workers, initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as executor:
+            return list(executor.map(lambda year: fetch(year, *args), years))
+    except requests.RequestException as e:
+        # RT errors, rejected credentials and timeouts end the page with a message instead of a traceback
+        logger.warning("RT request failed: %s", e)
+        st.error(f"Could not load ticket data from RT: {e}")
+        st.stop()
+
+
 def login_request(base_url, username, password):
     url = f"{base_url}"
     data = {
@@ -48,8 +170,8 @@ def login_request(base_url, username, password):
         'pass': password
     }
     
-    return requests.post(url, data=data)
+    return session.post(url, data=data, timeout=REQUEST_TIMEOUT)
 
 def logout_request(base_url, cookies):
     url = f"{base_url}logout"
-    return requests.post(url, cookies=cookies)
+    return session.post(url, cookies=cookies, timeout=REQUEST_TIMEOUT)